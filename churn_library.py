@@ -48,11 +48,20 @@ quant_columns = [
     'Avg_Utilization_Ratio',
 ]
 
+feature_columns = quant_columns + [f'{cat}_Churn' for cat in cat_columns]
+
 DATA_PATH = './data/bank_data.csv'
 EDA_PTH = './images/eda'
 MODELS_DIR = './models'
 RESULTS_DIR = './images/results'
 
+rfc_param_grid = {
+    'n_estimators': [200, 500],
+    'max_features': ['auto', 'sqrt'],
+    'max_depth': [4, 5, 100],
+    'criterion': ['gini', 'entropy']
+}
+
 
 def import_data(pth):
     '''
@@ -104,6 +113,24 @@ def perform_eda(df, eda_dir):
     plt.close()
 
 
+def churn_encodings(df, category_lst):
+    '''
+    computes the proportion of churn for each category of each categorical column
+
+    input:
+            df: pandas dataframe containing a Churn column
+            category_lst: list of columns that contain categorical features
+
+    output:
+            encodings: dict mapping each column to a dict of category to
+            churn proportion
+    '''
+    return {
+        cat: df.groupby(cat)['Churn'].mean().to_dict()
+        for cat in category_lst
+    }
+
+
 def encoder_helper(df, category_lst):
     '''
     helper function to turn each categorical column into a new column with
@@ -118,16 +145,164 @@ def encoder_helper(df, category_lst):
     output:
             df: pandas dataframe with new columns for
     '''
-    new_cols = []
-    for cat in category_lst:
-        groups = df.groupby(cat).mean()['Churn']
-        cat_series = df[cat].apply(
-            lambda val: groups.loc[val]).rename(f'{cat}_Churn')
-        new_cols.append(cat_series)
+    encodings = churn_encodings(df, category_lst)
+    new_cols = [
+        df[cat].map(encodings[cat]).rename(f'{cat}_Churn')
+        for cat in category_lst
+    ]
 
     return pd.concat([df, *new_cols], axis=1)
 
 
+def _encode_into(series, encoding, out):
+    '''
+    writes the churn proportion of each category of series into out, raising
+    a KeyError for categories that were not seen when computing encoding
+    '''
+    codes, uniques = pd.factorize(series)
+    unknown = [val for val in uniques if val not in encoding]
+    if (codes < 0).any():
+        unknown.append(np.nan)
+    if unknown:
+        raise KeyError(f'{series.name}: unknown categories {unknown}')
+    values = np.array([encoding[val] for val in uniques], dtype=out.dtype)
+    np.take(values, codes, out=out, mode='clip')
+
+
+def _check_out(out, shape):
+    '''
+    raises a ValueError if out cannot hold features of the given shape
+    '''
+    if out.shape != shape:
+        raise ValueError(
+            f'out has shape {out.shape}, expected {shape}')
+    if not np.issubdtype(out.dtype, np.floating):
+        raise ValueError(
+            f'out has dtype {out.dtype}, expected a floating dtype')
+
+
+def transform_record(record, encodings, out=None):
+    '''
+    turns a single customer record into its feature vector
+
+    input:
+            record: mapping of column name to raw value
+            encodings: dict returned by churn_encodings
+            out: optional float numpy array of length len(feature_columns)
+            to write the features into
+
+    output:
+            out: numpy array ordered as feature_columns
+    '''
+    if out is None:
+        out = np.empty(len(feature_columns))
+    else:
+        _check_out(out, (len(feature_columns),))
+    for i, col in enumerate(quant_columns):
+        out[i] = record[col]
+    for i, cat in enumerate(cat_columns, start=len(quant_columns)):
+        out[i] = encodings[cat][record[cat]]
+    return out
+
+
+def transform_batch(df, encodings, out=None):
+    '''
+    turns a batch of customer records into the feature matrix, matching the
+    values produced by encoder_helper and perform_feature_engineering. Each
+    column is written straight into out, without an intermediate copy of
+    the batch
+
+    input:
+            df: pandas dataframe of raw customer records
+            encodings: dict returned by churn_encodings
+            out: optional float numpy array of shape
+            (len(df), len(feature_columns)) to write the features into
+
+    output:
+            out: numpy array whose columns are ordered as feature_columns
+    '''
+    if out is None:
+        out = np.empty((len(df), len(feature_columns)))
+    else:
+        _check_out(out, (len(df), len(feature_columns)))
+    for i, col in enumerate(quant_columns):
+        np.copyto(out[:, i], df[col].to_numpy(), casting='unsafe')
+    for i, cat in enumerate(cat_columns, start=len(quant_columns)):
+        _encode_into(df[cat], encodings[cat], out[:, i])
+    return out
+
+
+def transform_chunks(chunks, encodings, chunk_size, out=None):
+    '''
+    turns an iterator of dataframes, such as the one returned by
+    pd.read_csv(..., chunksize=chunk_size), into feature matrices. A single
+    dataframe is split into chunks of chunk_size rows
+
+    input:
+            chunks: pandas dataframe or iterable of pandas dataframes of at
+            most chunk_size rows
+            encodings: dict returned by churn_encodings
+            chunk_size: maximum number of rows in a chunk
+            out: optional float numpy array of shape
+            (chunk_size, len(feature_columns)) reused for every chunk
+
+    output:
+            generator of numpy arrays, one per chunk. When out is given, the
+            arrays are views of out and are overwritten by the next chunk
+    '''
+    if chunk_size < 1:
+        raise ValueError(f'chunk_size must be positive, got {chunk_size}')
+    if out is not None:
+        _check_out(out, (chunk_size, len(feature_columns)))
+    if isinstance(chunks, pd.DataFrame):
+        chunks = (chunks.iloc[i:i + chunk_size]
+                  for i in range(0, len(chunks), chunk_size))
+    return _iter_chunks(chunks, encodings, chunk_size, out)
+
+
+def _iter_chunks(chunks, encodings, chunk_size, out):
+    '''
+    generator behind transform_chunks, once its arguments have been checked
+    '''
+    for chunk in chunks:
+        if len(chunk) > chunk_size:
+            raise ValueError(
+                f'chunk has {len(chunk)} rows, more than chunk_size {chunk_size}')
+        chunk_out = None if out is None else out[:len(chunk)]
+        yield transform_batch(chunk, encodings, out=chunk_out)
+
+
+def transform_features(records, encodings, chunk_size=None, out=None):
+    '''
+    turns raw customer records into the model feature matrix
+
+    input:
+            records: a single record (dict or pandas series), a batch
+            (pandas dataframe, split in chunks when chunk_size is given)
+            or an iterable of dataframes. The chunk size
+            of an iterable is taken from chunk_size or, for the reader
+            returned by pd.read_csv(..., chunksize=n), from its chunksize
+            encodings: dict returned by churn_encodings
+            chunk_size: maximum number of rows per chunk for chunked input
+            out: optional float numpy array to write the features into
+
+    output:
+            numpy array for a record or a batch, generator of numpy arrays
+            for chunks (see transform_chunks)
+    '''
+    if chunk_size is None:
+        chunk_size = getattr(records, 'chunksize', None)
+    if chunk_size is not None:
+        return transform_chunks(records, encodings, chunk_size, out=out)
+    if isinstance(records, pd.DataFrame):
+        return transform_batch(records, encodings, out=out)
+    if isinstance(records, (dict, pd.Series)):
+        return transform_record(records, encodings, out=out)
+    raise TypeError(
+        f'records of type {type(records).__name__} must be a dict, a series '
+        'or a dataframe, or an iterable of dataframes with chunk_size given')
+
+
 def perform_feature_engineering(df):
     '''
     input:
@@ -142,18 +317,7 @@ def perform_feature_engineering(df):
               y_train: y training data
               y_test: y testing data
     '''
-    keep_cols = [
-        'Customer_Age', 'Dependent_count', 'Months_on_book',
-        'Total_Relationship_Count', 'Months_Inactive_12_mon',
-        'Contacts_Count_12_mon', 'Credit_Limit',
-        'Total_Revolving_Bal', 'Avg_Open_To_Buy',
-        'Total_Amt_Chng_Q4_Q1', 'Total_Trans_Amt',
-        'Total_Trans_Ct', 'Total_Ct_Chng_Q4_Q1',
-        'Avg_Utilization_Ratio', 'Gender_Churn',
-        'Education_Level_Churn', 'Marital_Status_Churn',
-        'Income_Category_Churn', 'Card_Category_Churn'
-    ]
-    X = df[keep_cols]
+    X = df[feature_columns]
     y = df['Churn']
     return train_test_split(
         X, y, test_size=0.3, random_state=42
@@ -257,7 +421,8 @@ def feature_importance_plot(model, X_data, output_pth):
             f'{model_name}_feature_importances.png'))
 
 
-def train_models(X_train, X_test, y_train, y_test, output_pth):
+def train_models(X_train, X_test, y_train, y_test, output_pth,
+                 param_grid=None, cv=5, n_jobs=None):
     '''
     train, store model results: images + scores, and store models
     input:
@@ -265,18 +430,23 @@ def train_models(X_train, X_test, y_train, y_test, output_pth):
               X_test: X testing data
               y_train: y training data
               y_test: y testing data
+              output_pth: directory in which the models will be saved
+              param_grid: grid searched for the random forest,
+              defaults to rfc_param_grid
+              cv: number of cross-validation folds
+              n_jobs: number of jobs run in parallel by the grid search
     output:
               None
     '''
-    rfc = RandomForestClassifier(random_state=42)
-    param_grid = {
-        'n_estimators': [200, 500],
-        'max_features': ['auto', 'sqrt'],
-        'max_depth': [4, 5, 100],
-        'criterion': ['gini', 'entropy']
-    }
+    if param_grid is None:
+        param_grid = rfc_param_grid
 
-    cv_rfc = GridSearchCV(estimator=rfc, param_grid=param_grid, cv=5)
+    rfc = RandomForestClassifier(random_state=42)
+    cv_rfc = GridSearchCV(
+        estimator=rfc,
+        param_grid=param_grid,
+        cv=cv,
+        n_jobs=n_jobs)
     cv_rfc.fit(X_train, y_train)
 
     y_train_preds_rf = cv_rfc.best_estimator_.predict(X_train)
@@ -4,9 +4,11 @@ This modules contains all the unit tests to be run against churn_library
 
 import logging
 import os
+import time
 import pytest
 
 import joblib
+import numpy as np
 
 import churn_library as cl
 
@@ -18,7 +20,7 @@ logging.basicConfig(
     format='%(name)s - %(levelname)s - %(message)s')
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def data_path():
     '''
     provides the path of the data csv file
@@ -46,10 +48,10 @@ def test_import(data_path):
         raise err
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def df_data(data_path):
     '''
-    returns the dataframe
+    returns the dataframe, read once and shared by the whole session
     '''
     return cl.import_data(data_path)
 
@@ -126,10 +128,11 @@ def test_encoder_helper(df_data, category_lst_fix):
         raise err
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def df_churn(df_data):
     '''
-    returns a dataframe where categorical columns have been encoded
+    returns a dataframe where categorical columns have been encoded,
+    shared by the whole session
     '''
     return cl.encoder_helper(df_data, category_lst)
 
@@ -163,10 +166,11 @@ def test_perform_feature_engineering(df_churn):
         raise err
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def split_dfs(df_churn):
     '''
-    Returns of tuples where the data has been split in train and test data sets
+    Returns of tuples where the data has been split in train and test data sets,
+    shared by the whole session
     '''
     return cl.perform_feature_engineering(df_churn)
 
@@ -206,19 +210,231 @@ def test_perform_feature_engineering_shapes(
         raise err
 
 
+@pytest.fixture(scope='session')
+def encodings(df_data):
+    '''
+    returns the churn proportion of each category, shared by the whole session
+    '''
+    return cl.churn_encodings(df_data, category_lst)
+
+
+def test_transform_batch_parity(df_data, df_churn, encodings):
+    '''
+    test that transform_features on a batch matches the training features
+    '''
+    expected = df_churn[cl.feature_columns].to_numpy(dtype=float)
+    try:
+        np.testing.assert_array_equal(
+            cl.transform_features(df_data, encodings), expected)
+        logging.info('Testing transform_features batch parity: SUCCESS')
+    except AssertionError as err:
+        logging.error(
+            'Testing transform_features error: batch differs from training features')
+        raise err
+
+
+def test_transform_record_parity(df_data, df_churn, encodings):
+    '''
+    test that transform_features on single records matches the training features
+    '''
+    expected = df_churn[cl.feature_columns].to_numpy(dtype=float)
+    try:
+        for i in range(0, len(df_data), 997):
+            record = df_data.iloc[i].to_dict()
+            np.testing.assert_array_equal(
+                cl.transform_features(record, encodings), expected[i])
+        logging.info('Testing transform_features record parity: SUCCESS')
+    except AssertionError as err:
+        logging.error(
+            'Testing transform_features error: record differs from training features')
+        raise err
+
+
+def test_transform_chunks_parity(df_data, df_churn, encodings):
+    '''
+    test that transform_features on chunks matches the training features
+    '''
+    chunk_size = 1000
+    expected = df_churn[cl.feature_columns].to_numpy(dtype=float)
+    chunks = (df_data.iloc[i:i + chunk_size]
+              for i in range(0, len(df_data), chunk_size))
+    try:
+        np.testing.assert_array_equal(
+            np.concatenate(list(cl.transform_features(
+                chunks, encodings, chunk_size=chunk_size))),
+            expected)
+        logging.info('Testing transform_features chunk parity: SUCCESS')
+    except AssertionError as err:
+        logging.error(
+            'Testing transform_features error: chunks differ from training features')
+        raise err
+
+
+def test_transform_dataframe_chunks_parity(df_data, df_churn, encodings):
+    '''
+    test that transform_features splits a dataframe given with chunk_size
+    '''
+    expected = df_churn[cl.feature_columns].to_numpy(dtype=float)
+    try:
+        np.testing.assert_array_equal(
+            np.concatenate(list(cl.transform_features(
+                df_data, encodings, chunk_size=1000))),
+            expected)
+        logging.info(
+            'Testing transform_features dataframe chunk parity: SUCCESS')
+    except AssertionError as err:
+        logging.error(
+            'Testing transform_features error: dataframe chunks differ from training features')
+        raise err
+
+
+def test_transform_unknown_category(df_data, encodings):
+    '''
+    test that transform_features rejects categories unseen in the encodings
+    '''
+    df_unknown = df_data.head(3).copy()
+    df_unknown['Card_Category'] = 'Unknown_Card'
+    with pytest.raises(KeyError):
+        cl.transform_features(df_unknown, encodings)
+    df_unknown.loc[df_unknown.index[0], 'Card_Category'] = np.nan
+    with pytest.raises(KeyError):
+        cl.transform_features(df_unknown, encodings)
+    logging.info('Testing transform_features unknown category: SUCCESS')
+
+
+def test_transform_chunk_too_large(df_data, encodings):
+    '''
+    test that transform_features rejects chunks larger than chunk_size
+    '''
+    chunks = [df_data.head(10)]
+    with pytest.raises(ValueError, match='chunk_size'):
+        list(cl.transform_features(chunks, encodings, chunk_size=5))
+    logging.info('Testing transform_features chunk too large: SUCCESS')
+
+
+bad_outs = [
+    np.empty((3, len(cl.feature_columns)), dtype=int),
+    np.empty((2, len(cl.feature_columns))),
+    np.empty((3, len(cl.feature_columns) - 1)),
+]
+
+
+@pytest.mark.parametrize('out', bad_outs)
+def test_transform_bad_out(df_data, encodings, out):
+    '''
+    test that transform_features rejects out buffers of wrong shape or dtype
+    '''
+    with pytest.raises(ValueError):
+        cl.transform_features(df_data.head(3), encodings, out=out)
+    with pytest.raises(ValueError):
+        cl.transform_features(
+            iter([df_data.head(3)]), encodings, chunk_size=3, out=out)
+    logging.info('Testing transform_features bad out: SUCCESS')
+
+
+bad_record_outs = [
+    np.empty(len(cl.feature_columns), dtype=int),
+    np.empty(len(cl.feature_columns) - 1),
+]
+
+
+@pytest.mark.parametrize('out', bad_record_outs)
+def test_transform_record_bad_out(df_data, encodings, out):
+    '''
+    test that transform_features rejects record buffers of wrong shape or dtype
+    '''
+    with pytest.raises(ValueError):
+        cl.transform_features(df_data.iloc[0].to_dict(), encodings, out=out)
+    logging.info('Testing transform_features record bad out: SUCCESS')
+
+
+def test_transform_not_a_record(encodings):
+    '''
+    test that transform_features rejects iterables without a chunk size
+    '''
+    with pytest.raises(TypeError):
+        cl.transform_features(iter([]), encodings)
+    logging.info('Testing transform_features not a record: SUCCESS')
+
+
+@pytest.mark.benchmark
+def test_transform_record_latency(df_data, encodings):
+    '''
+    benchmark the per-row latency of transform_features
+    '''
+    records = df_data.to_dict('records')
+    out = np.empty(len(cl.feature_columns))
+    start = time.perf_counter()
+    for record in records:
+        cl.transform_record(record, encodings, out=out)
+    latency = (time.perf_counter() - start) / len(records)
+    logging.info(
+        'Benchmark transform_record: %.2f us per row', latency * 1e6)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('batch_size', [1, 100, 10000])
+def test_transform_batch_latency(df_data, encodings, batch_size):
+    '''
+    benchmark the per-batch latency of transform_features
+    '''
+    batch = df_data.sample(batch_size, replace=True, random_state=42)
+    out = np.empty((batch_size, len(cl.feature_columns)))
+    n_runs = 20
+    start = time.perf_counter()
+    for _ in range(n_runs):
+        cl.transform_batch(batch, encodings, out=out)
+    latency = (time.perf_counter() - start) / n_runs
+    logging.info(
+        'Benchmark transform_batch: %.2f ms per batch of %d rows (%.2f us per row)',
+        latency * 1e3, batch_size, latency * 1e6 / batch_size)
+
+
+fast_train_params = {
+    'param_grid': {
+        'n_estimators': [10],
+        'max_features': ['sqrt'],
+        'max_depth': [4, 100],
+        'criterion': ['gini'],
+    },
+    'cv': 2,
+    'n_jobs': -1,
+}
+
+
 def test_train_models(split_dfs, mod_tmp_path):
     '''
-    test train_models
+    test train_models with a reduced grid search
     '''
     X_train, X_test, y_train, y_test = split_dfs
     try:
-        cl.train_models(X_train, X_test, y_train, y_test, mod_tmp_path)
+        cl.train_models(
+            X_train,
+            X_test,
+            y_train,
+            y_test,
+            mod_tmp_path,
+            **fast_train_params)
         logging.info('Testing train_models: SUCCESS')
     except Exception as err:
         logging.error('Testing train_models: ERROR')
         raise err
 
 
+@pytest.mark.slow
+def test_train_models_full(split_dfs, tmp_path):
+    '''
+    test train_models with the full grid search, only run with -m slow
+    '''
+    X_train, X_test, y_train, y_test = split_dfs
+    try:
+        cl.train_models(X_train, X_test, y_train, y_test, tmp_path)
+        logging.info('Testing train_models with full grid search: SUCCESS')
+    except Exception as err:
+        logging.error('Testing train_models with full grid search: ERROR')
+        raise err
+
+
 @pytest.fixture
 def rfc(mod_tmp_path):
     '''